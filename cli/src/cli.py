@@ -1,5 +1,8 @@
 # src/cli.py
 import argparse
+import asyncio
+import hashlib
+import re
 from pathlib import Path
 from rich.console import Console
 from .config import KB_DIR, DEFAULT_PROMPT, MAX_RULES_TO_PROCESS
@@ -9,12 +12,16 @@ from .llm_client import LLMClient
 from .utils import unified_diff
 console = Console()
 
+# compiled once; matches ```c / ```C / ```c++ / bare ``` fences alike
+_FENCED_CODE_RE = re.compile(r"```[a-zA-Z+]*\n([\s\S]*?)\n```")
+
 def main():
     parser = argparse.ArgumentParser(description="Klocwork MISRA Fixer - semi-auto CLI")
     parser.add_argument("file", help="Path to C source file to analyze and fix")
     parser.add_argument("--kb", help="Path to knowledge_base directory", default=str(KB_DIR))
     parser.add_argument("--model", help="Model name override")
     parser.add_argument("--auto-apply", action="store_true", help="Auto apply all fixes (dangerous)")
+    parser.add_argument("--no-cache", action="store_true", help="Bypass the on-disk LLM reply cache")
     args = parser.parse_args()
     kb_dir = Path(args.kb)
     if not kb_dir.exists():
@@ -26,28 +33,53 @@ def main():
     code = read_code(source_path)
     candidates = find_checker_mentions(code, kb)
     if not candidates:
-        console.print("[yellow]No explicit checker ids found. Running fuzzy match...[/yellow]")
-        candidates = find_checker_mentions(code, kb) 
+        console.print("[yellow]No explicit checker ids or rule keywords found.[/yellow]")
 
     console.print(f"Found {len(candidates)} candidate checkers (showing up to {MAX_RULES_TO_PROCESS})")
     candidates = candidates[:MAX_RULES_TO_PROCESS]
-    llm = LLMClient()
+    llm = LLMClient(use_cache=not args.no_cache)
     current_code = code
-    for checker in candidates:
+    # digest of current_code, refreshed only when a fix is accepted
+    current_digest = hashlib.blake2b(code.encode()).digest()
+    # fire all proposals in parallel up-front: one round-trip worth of latency
+    # instead of one blocking call per checker
+    tasks = [(checker, kb.get(checker, "(no rule text found)"), source_path.name, code) for checker in candidates]
+    if len(tasks) == 1:
+        # single candidate: stream the reply so the user sees progress live
+        checker = tasks[0][0]
+        parts = []
+        with console.status(f"Streaming fix for {checker}..."):
+            for piece in llm.stream_fix(*tasks[0]):
+                parts.append(piece)
+        replies = ["".join(parts)]
+    else:
+        console.print(f"Asking LLM for proposed fixes ({len(tasks)} checkers in parallel)...")
+        replies = asyncio.run(llm.propose_fixes_parallel(tasks))
+    # set once a fix is accepted: the remaining parallel replies were
+    # proposed against the original code and have gone stale
+    code_changed = False
+    for checker, reply in zip(candidates, replies):
         console.rule(f"Candidate: {checker}")
         rule_text = kb.get(checker, "(no rule text found)")
         console.print(rule_text.splitlines()[:6])
-        # ask LLM to propose fix
-        console.print("Asking LLM for a proposed fix...")
-        reply = llm.propose_fix(checker, rule_text, source_path.name, current_code)
+        if code_changed:
+            # applying a stale reply would diff against the updated code and
+            # silently revert the earlier accepted fix, so re-propose this
+            # checker sequentially against the current code instead
+            with console.status(f"Re-proposing fix for {checker} against updated code..."):
+                reply = llm.propose_fix(checker, rule_text, source_path.name, current_code)
         # extract fenced code if present
-        import re
-        m = re.search(r"```(?:c|C)\n([\s\S]*?)\n```", reply)
+        m = _FENCED_CODE_RE.search(reply)
         if m:
             fixed = m.group(1).strip() + "\n"
         else:
             # fallback: take entire reply as code
             fixed = reply
+        # cheap no-op check before paying for a full diff: length first,
+        # then hash against the digest maintained across iterations
+        if len(fixed) == len(current_code) and hashlib.blake2b(fixed.encode()).digest() == current_digest:
+            console.print("[green]No changes proposed by the model for this checker.[/green]")
+            continue
         diff_text = unified_diff(current_code, fixed, fromfile=source_path.name, tofile=source_path.name)
         if not diff_text.strip():
             console.print("[green]No changes proposed by the model for this checker.[/green]")
@@ -59,6 +91,8 @@ def main():
             apply = console.input("Apply this change? (y/N): ").strip().lower() in ("y", "yes")
         if apply:
             current_code = fixed
+            current_digest = hashlib.blake2b(fixed.encode()).digest()
+            code_changed = True
             console.print("[green]Applied change.[/green]")
         else:
             console.print("[yellow]Skipped.[/yellow]")
@@ -1,19 +1,165 @@
 # src/kb_loader.py
+import mmap
+import os
+import pickle
+import re
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+import ahocorasick
+from collections.abc import Mapping
 from pathlib import Path
-from typing import Dict
-"""Load every markdown file under kb_dir. Return dict: {checker_name: content}.
+from typing import Iterator
+"""Lazy access to every markdown file under kb_dir.
 
 
 Filenames are expected like `FNH.MIGHT.md` -> checker id `FNH.MIGHT`.
+Instead of eagerly read_text-ing every rule file at startup, we only record
+the paths and mmap a file the first time its text is actually requested — the
+kernel demand-pages just the bytes touched, with no read() copy into userspace.
 """
 
-def load_kb(kb_dir: Path) -> Dict[str, str]:
-    kb = {}
-    for p in sorted(kb_dir.glob("*.md")):
-        name = p.stem # FNH.MIGHT from FNH.MIGHT.md
+_KEYWORD_RE = re.compile(r"[a-z_]{3,}")
+
+class KB(Mapping):
+    def __init__(self, kb_dir: Path):
+        paths = sorted(kb_dir.glob("*.md"))
+        self._paths = {p.stem: p for p in paths}
+        # mmaps are cheap to re-create, so let unused ones be collected
+        self._mmaps = weakref.WeakValueDictionary()
+        self._automaton = None
+        self._keyword_index = None
+        self._texts = {}  # eager-decoded cache, filled by preload()
+        self._cache_file = None
+        self._load_cached_indexes(kb_dir, paths)
+
+    def _load_cached_indexes(self, kb_dir: Path, paths) -> None:
+        """Warm-start the automaton + keyword index from a pickled artifact.
+
+        The cache filename embeds the max mtime and file count of the KB, so
+        any .md edit/add/remove simply misses and triggers a rebuild; stale
+        artifacts are removed as a side effect.
+        """
+        if not paths:
+            return
+        sig = f"{max(p.stat().st_mtime_ns for p in paths)}-{len(paths)}"
+        cache_dir = kb_dir / ".cache"
+        self._cache_file = cache_dir / f"kb-{sig}.pkl"
+        if self._cache_file.exists():
+            try:
+                with self._cache_file.open("rb") as f:
+                    self._automaton, self._keyword_index = pickle.load(f)
+                return
+            except Exception:
+                self._automaton = None
+                self._keyword_index = None
+        for stale in cache_dir.glob("kb-*.pkl"):
+            try:
+                stale.unlink()
+            except OSError:
+                pass
+
+    def _maybe_persist_indexes(self) -> None:
+        if self._cache_file is None or self._cache_file.exists():
+            return
+        if self._automaton is None or self._keyword_index is None:
+            return
         try:
-            text = p.read_text(encoding="utf-8")
+            self._cache_file.parent.mkdir(parents=True, exist_ok=True)
+            with self._cache_file.open("wb") as f:
+                pickle.dump((self._automaton, self._keyword_index), f, protocol=5)
         except Exception:
-            text = p.read_text(encoding="latin-1")
-        kb[name] = text
-    return kb
\ No newline at end of file
+            # cache write failures must never break a scan
+            pass
+
+    def _mmap_for(self, stem: str) -> mmap.mmap:
+        mm = self._mmaps.get(stem)
+        if mm is None:
+            with self._paths[stem].open("rb") as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._mmaps[stem] = mm
+        return mm
+
+    def __getitem__(self, stem: str) -> str:
+        text = self._texts.get(stem)
+        if text is not None:
+            return text
+        path = self._paths[stem]  # raises KeyError for unknown checkers
+        if path.stat().st_size == 0:
+            return ""
+        mm = self._mmap_for(stem)
+        return bytes(mm).decode("utf-8", errors="replace")
+
+    def first_line(self, stem: str) -> str:
+        """Return just the first line of a rule without decoding the whole file."""
+        text = self._texts.get(stem)
+        if text is not None:
+            return text.split("\n", 1)[0]
+        path = self._paths[stem]
+        if path.stat().st_size == 0:
+            return ""
+        mm = self._mmap_for(stem)
+        end = mm.find(b"\n")
+        if end == -1:
+            end = len(mm)
+        return mm[:end].decode("utf-8", errors="replace")
+
+    def preload(self) -> None:
+        """Eagerly read every rule file with a thread pool.
+
+        read_bytes releases the GIL, so parallel reads hide per-file syscall
+        latency on a cold page cache. Only worth it when most rules will
+        actually be used; the default lazy mode never pays this cost.
+        """
+        def _load(item):
+            stem, p = item
+            return stem, p.read_bytes().decode("utf-8", errors="replace")
+        with ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 4) * 4)) as ex:
+            self._texts = dict(ex.map(_load, self._paths.items()))
+
+    @property
+    def automaton(self):
+        """Aho-Corasick automaton over all lowercased checker ids, built once.
+
+        One automaton scan of the source is O(len(code) + matches) regardless of
+        how many rules the KB holds, versus one substring search per checker.
+        """
+        if self._automaton is None and self._paths:
+            A = ahocorasick.Automaton()
+            for stem in self._paths:
+                A.add_word(stem.lower(), stem)
+            A.make_automaton()
+            self._automaton = A
+            self._maybe_persist_indexes()
+        return self._automaton
+
+    @property
+    def keyword_index(self):
+        """Map of first-line keyword -> checker ids owning it, built once.
+
+        Indexes the top 6 tokens of each rule's first line so the analyzer can
+        look keywords up per code token instead of re-tokenizing every rule's
+        snippet per scan.
+        """
+        if self._keyword_index is None:
+            index = {}
+            for stem in self._paths:
+                snippet = self.first_line(stem)[:200].strip().lower()
+                for tok in _KEYWORD_RE.findall(snippet)[:6]:
+                    index.setdefault(tok, []).append(stem)
+            self._keyword_index = index
+            self._maybe_persist_indexes()
+        return self._keyword_index
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._paths)
+
+    def __len__(self) -> int:
+        return len(self._paths)
+
+
+def load_kb(kb_dir: Path, lazy: bool = True) -> KB:
+    kb = KB(kb_dir)
+    if not lazy:
+        kb.preload()
+    return kb
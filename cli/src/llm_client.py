@@ -1,48 +1,173 @@
 # src/llm_client.py
 import os
-from openai import OpenAI
-from typing import Dict
+import asyncio
+import hashlib
+from pathlib import Path
+from diskcache import Cache
+import httpx
+from openai import OpenAI, AsyncOpenAI
+from typing import Dict, List, Sequence, Tuple
 from .config import MODEL_NAME
 
+# Cap on concurrent in-flight completions so we respect provider rate limits.
+MAX_PARALLEL_REQUESTS = int(os.environ.get("MAX_PARALLEL_REQUESTS", "8"))
+
+# On-disk memo of past replies: re-runs over the same (model, checker, rule,
+# code) skip the network + inference entirely.
+_LLM_CACHE = Cache(str(Path(__file__).resolve().parents[1] / ".llm_cache"))
+
+# Process-wide (sync, async) client pairs keyed by endpoint credentials: one
+# connection pool per endpoint, so keep-alive/TLS sessions survive across
+# LLMClient instances instead of re-handshaking per construction.
+_CLIENT_CACHE: Dict[tuple, tuple] = {}
+
+
+def _get_clients(api_key: str, api_base: str):
+    key = (api_key, api_base)
+    clients = _CLIENT_CACHE.get(key)
+    if clients is None:
+        kwargs = {"api_key": api_key}
+        if api_base:
+            kwargs["base_url"] = api_base
+        limits = httpx.Limits(max_keepalive_connections=16, max_connections=32)
+        clients = (
+        OpenAI(http_client=httpx.Client(limits=limits, http2=True), **kwargs),
+        AsyncOpenAI(http_client=httpx.AsyncClient(limits=limits, http2=True), **kwargs),
+        )
+        _CLIENT_CACHE[key] = clients
+    return clients
+
+# static across every request; built exactly once
+_SYSTEM_MSG = {
+    "role": "system",
+    "content": (
+    "You are an assistant that helps fix C source code to comply with a MISRA-like rule. "
+    "Given the rule text and the original source file, return a single fenced code block with the entire fixed source. "
+    "If you cannot confidently fix, return the original file unchanged inside the fence and explain briefly outside the fence."
+    ),
+}
+
+
 class LLMClient:
-    def __init__(self, api_key: str = None, api_base: str = None, model: str = MODEL_NAME):
+    def __init__(self, api_key: str = None, api_base: str = None, model: str = MODEL_NAME, use_cache: bool = True):
         api_key = api_key or os.environ.get("OPENAI_API_KEY")
         api_base = api_base or os.environ.get("OPENAI_API_BASE")
         if api_key is None:
             raise ValueError("OPENAI_API_KEY (or API_KEY) environment variable must be set")
-        kwargs = {"api_key": api_key}
-        if api_base:
-            kwargs["api_base"] = api_base
-        self.client = OpenAI(**kwargs)
+        self.client, self.async_client = _get_clients(api_key, api_base)
         self.model = model
+        self.use_cache = use_cache
+        # per-(checker, file) user-message prefix: the rule text and headers
+        # are re-sent many times per session but only ever built once
+        self._msg_cache: Dict[tuple, str] = {}
 
-"""Ask the model to produce a *fixed* version of the code.
+    def _cache_key(self, checker_id: str, rule_text: str, code: str) -> str:
+        h = hashlib.blake2b(digest_size=16)
+        h.update(f"{self.model}|{checker_id}|{code}".encode())
+        h.update(rule_text.encode())
+        return h.hexdigest()
 
+    def _build_messages(self, checker_id: str, rule_text: str, filename: str, code: str) -> List[Dict]:
+        """Build the chat messages asking the model for a *fixed* version of the code.
 
-The assistant should return the full updated source file only (no extra chatter).
-We instruct the model to return the file in a fenced ```c block with a marker 'FIXED-CODE'.
-"""
+        The assistant should return the full updated source file only (no extra chatter),
+        inside a fenced ```c block. Everything except the code itself is static
+        per (checker, file), so the envelope is cached and only the mutable
+        code tail is spliced in per call.
+        """
+        key = (checker_id, filename)
+        prefix = self._msg_cache.get(key)
+        if prefix is None:
+            prefix = "".join((
+            f"Checker: {checker_id}\n\nRule and guidance:\n", rule_text,
+            f"\n\nFile: {filename}\n\nOriginal source:\n```c\n",
+            ))
+            self._msg_cache[key] = prefix
+        return [
+        _SYSTEM_MSG,
+        {"role": "user", "content": prefix + code + "\n```"},
+        ]
 
-def propose_fix(self, checker_id: str, rule_text: str, filename: str, code: str) -> str:
-    system = (
-    "You are an assistant that helps fix C source code to comply with a MISRA-like rule. "
-    "Given the rule text and the original source file, return a single fenced code block with the entire fixed source. "
-    "If you cannot confidently fix, return the original file unchanged inside the fence and explain briefly outside the fence."
-    )
-    user_msg = (
-    f"Checker: {checker_id}\n\nRule and guidance:\n{rule_text}\n\n"
-    f"File: {filename}\n\nOriginal source:\n```c\n{code}\n```")
-
-
-    resp = self.client.chat.completions.create(
-    model=self.model,
-    messages=[
-    {"role": "system", "content": system},
-    {"role": "user", "content": user_msg},
-    ],
-    max_tokens=1500,
-    temperature=0.0,
-    )
-    # pick the assistant content
-    content = resp.choices[0].message.content
-    return content
\ No newline at end of file
+    def propose_fix(self, checker_id: str, rule_text: str, filename: str, code: str) -> str:
+        """Ask the model for a fix for a single checker (blocking)."""
+        return "".join(self.stream_fix(checker_id, rule_text, filename, code))
+
+    def stream_fix(self, checker_id: str, rule_text: str, filename: str, code: str):
+        """Yield the model's reply incrementally as chunks of text.
+
+        Streams the completion instead of waiting for the full max_tokens
+        generation, so the CLI can display progress live. Once the closing
+        ``` fence of the fixed source has been seen, the HTTP stream is
+        closed early — any trailing chatter the model would have produced
+        is never generated or billed.
+        """
+        key = self._cache_key(checker_id, rule_text, code)
+        if self.use_cache:
+            hit = _LLM_CACHE.get(key)
+            if hit is not None:
+                yield hit
+                return
+        resp = self.client.chat.completions.create(
+        model=self.model,
+        messages=self._build_messages(checker_id, rule_text, filename, code),
+        max_tokens=1500,
+        temperature=0.0,
+        stream=True,
+        )
+        text = ""
+        emitted = 0
+        open_end = -1  # index just past the opening fence line, once seen
+        for chunk in resp:
+            delta = chunk.choices[0].delta.content
+            if not delta:
+                continue
+            text += delta
+            done = False
+            if open_end < 0:
+                i = text.find("```")
+                if i >= 0:
+                    j = text.find("\n", i)
+                    if j >= 0:
+                        open_end = j + 1
+            if open_end >= 0:
+                k = text.find("\n```", open_end)
+                if k >= 0:
+                    # closing fence seen: keep it, drop anything after, stop streaming
+                    text = text[:k + 4]
+                    done = True
+            if len(text) > emitted:
+                yield text[emitted:]
+                emitted = len(text)
+            if done:
+                resp.close()
+                break
+        if self.use_cache:
+            _LLM_CACHE.set(key, text)
+
+    async def _propose_fix_async(self, sem: asyncio.Semaphore, checker_id: str, rule_text: str, filename: str, code: str) -> str:
+        key = self._cache_key(checker_id, rule_text, code)
+        if self.use_cache:
+            hit = _LLM_CACHE.get(key)
+            if hit is not None:
+                return hit
+        async with sem:
+            resp = await self.async_client.chat.completions.create(
+            model=self.model,
+            messages=self._build_messages(checker_id, rule_text, filename, code),
+            max_tokens=1500,
+            temperature=0.0,
+            )
+            content = resp.choices[0].message.content
+        if self.use_cache:
+            _LLM_CACHE.set(key, content)
+        return content
+
+    async def propose_fixes_parallel(self, tasks: Sequence[Tuple[str, str, str, str]]) -> List[str]:
+        """Run propose_fix for many (checker_id, rule_text, filename, code) tuples concurrently.
+
+        Each task is latency-bound on the provider, so issuing them together costs
+        roughly one round-trip instead of one per checker. Concurrency is bounded by
+        MAX_PARALLEL_REQUESTS; results come back in the same order as `tasks`.
+        """
+        sem = asyncio.Semaphore(MAX_PARALLEL_REQUESTS)
+        return await asyncio.gather(*[self._propose_fix_async(sem, *t) for t in tasks])
@@ -3,8 +3,12 @@ import re
 from pathlib import Path
 from typing import List, Tuple, Dict
 
+_TOKEN_RE = re.compile(r"[a-z_]{3,}")
+
 def read_code(path: Path) -> str:
-    return path.read_text(encoding="utf-8")
+    # bulk read + one-shot decode; skips TextIOWrapper's incremental decoder
+    # and universal-newline pass over every byte
+    return path.read_bytes().decode("utf-8")
 
 """Return list of checker ids which appear as exact tokens or appear in comments.
 
@@ -18,30 +22,72 @@ This is intentionally conservative — it returns a list of candidate checkers.
 """
 
 def find_checker_mentions(code: str, kb: Dict[str, str]) -> List[str]:
-    candidates = []
+    # insertion-ordered dict: O(1) dedup instead of `checker not in candidates`
+    candidates: Dict[str, None] = {}
     code_lower = code.lower()
-    
+
     # 1) exact tokens (e.g., comment `/* FNH.MIGHT */` or `// FNH.MIGHT`)
-    for checker in kb.keys():
-        if checker.lower() in code_lower:
-            candidates.append(checker)
+    automaton = getattr(kb, "automaton", None)
+    if automaton is not None:
+        # single linear scan of the code for every checker id at once
+        for _, checker in automaton.iter(code_lower):
+            candidates.setdefault(checker, None)
+    else:
+        for checker in kb.keys():
+            if checker.lower() in code_lower:
+                candidates.setdefault(checker, None)
 
 
     # 2) keyword matching from KB short description (first 50 chars)
     # (optional, small contribution)
-    for checker, text in kb.items():
-        snippet = text.splitlines()[0][:200].strip().lower()
-        tokens = re.findall(r"[a-z_]{3,}", snippet)
-        for t in tokens[:6]:
-            if t in code_lower and checker not in candidates:
-                candidates.append(checker)
-                break
-    return candidates
+    keyword_index = getattr(kb, "keyword_index", None)
+    if keyword_index is not None:
+        # tokenize the code once; per-token dict lookups replace one substring
+        # scan of the whole file per checker
+        code_tokens = set(_TOKEN_RE.findall(code_lower))
+        for tok, checkers in keyword_index.items():
+            if tok in code_tokens:
+                for checker in checkers:
+                    candidates.setdefault(checker, None)
+    else:
+        first_line = getattr(kb, "first_line", None)
+        for checker in kb.keys():
+            if checker in candidates:
+                continue
+            line = first_line(checker) if first_line else kb[checker].splitlines()[0]
+            snippet = line[:200].strip().lower()
+            tokens = _TOKEN_RE.findall(snippet)
+            for t in tokens[:6]:
+                if t in code_lower:
+                    candidates.setdefault(checker, None)
+                    break
+    return list(candidates)
+
+
+
+
+class _LineView:
+    """1-based line-number view over a list of lines.
+
+    Indexes and iterates like the old {lineno: line} dict but allocates
+    nothing beyond the splitlines list — no boxed ints or dict entries for
+    lines that are never queried.
+    """
+    __slots__ = ("_lines",)
+
+    def __init__(self, lines):
+        self._lines = lines
+
+    def __getitem__(self, lineno: int) -> str:
+        return self._lines[lineno - 1]
 
+    def __len__(self) -> int:
+        return len(self._lines)
 
+    def __iter__(self):
+        return ((i + 1, line) for i, line in enumerate(self._lines))
 
 
 """Return simple map of line numbers to code for context display."""
-def locate_functions_and_lines(code: str) -> Dict:
-    lines = code.splitlines()
-    return {i + 1: lines[i] for i in range(len(lines))}
\ No newline at end of file
+def locate_functions_and_lines(code: str) -> _LineView:
+    return _LineView(code.splitlines())
\ No newline at end of file
@@ -14,14 +14,24 @@ Notes:
 """
 
 import os
+import re
 import shutil
 import subprocess
 import json
+import threading
 from typing import List, Dict, Optional
 from pathlib import Path
 
 from dotenv import load_dotenv
 
+# Optional libgit2 bindings: lets the repo bootstrap / ref lookups run
+# in-process instead of forking git. Everything falls back to subprocess.
+try:
+    import pygit2
+    _HAS_PYGIT2 = True
+except ImportError:
+    _HAS_PYGIT2 = False
+
 # Load .env from project root
 project_root = Path(__file__).resolve().parents[1]
 dotenv_path = project_root / ".env"
@@ -46,7 +56,87 @@ class AiderEngineError(Exception):
     pass
 
 
+# Hunk header: "@@ -start[,count] +start[,count] @@"; counts default to 1
+_HUNK_HEADER_RE = re.compile(r"@@ -\d+(?:,(\d+))? \+\d+(?:,(\d+))? @@")
+
+
+def unified_to_search_replace(patch_text: str) -> str:
+    """
+    Convert a unified diff into Aider-style search/replace blocks:
+
+        <path>
+        <<<<<<< SEARCH
+        <context + removed lines>
+        =======
+        <context + added lines>
+        >>>>>>> REPLACE
+
+    One block per hunk. Blocks are typically smaller than the diff they come
+    from (no headers, no index lines, no +/- column) and are the native edit
+    format of Aider, so they can be fed back into a fix prompt verbatim.
+    Hunk line counts from the @@ header are used to walk each hunk exactly,
+    so diff content that happens to look like a header cannot confuse the
+    parser.
+    """
+    if not patch_text:
+        return ""
+
+    lines = patch_text.splitlines(keepends=True)
+    blocks: List[str] = []
+    current_file = ""
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        if line.startswith("+++ "):
+            # "+++ b/path" or "+++ path (modified)"; strip the b/ prefix git adds
+            name = line[4:].split("\t")[0].strip()
+            current_file = name[2:] if name.startswith("b/") else name
+            i += 1
+        elif line.startswith("@@"):
+            m = _HUNK_HEADER_RE.match(line)
+            old_n = int(m.group(1)) if m and m.group(1) is not None else 1
+            new_n = int(m.group(2)) if m and m.group(2) is not None else 1
+            i += 1
+            search: List[str] = []
+            replace: List[str] = []
+            while i < len(lines) and (old_n > 0 or new_n > 0):
+                tag, body = lines[i][:1], lines[i][1:]
+                if tag == "\\":
+                    pass  # "\ No newline at end of file" marker
+                elif tag == "-":
+                    search.append(body)
+                    old_n -= 1
+                elif tag == "+":
+                    replace.append(body)
+                    new_n -= 1
+                else:
+                    search.append(body)
+                    replace.append(body)
+                    old_n -= 1
+                    new_n -= 1
+                i += 1
+            blocks.append("".join([
+                f"{current_file}\n<<<<<<< SEARCH\n",
+                "".join(search),
+                "" if not search or search[-1].endswith("\n") else "\n",
+                "=======\n",
+                "".join(replace),
+                "" if not replace or replace[-1].endswith("\n") else "\n",
+                ">>>>>>> REPLACE\n",
+            ]))
+        else:
+            i += 1
+
+    return "\n".join(blocks)
+
+
 class AiderEngine:
+    # All engine instances share one git repo (cwd), so the whole
+    # snapshot-HEAD -> aider -> diff window must be a critical section:
+    # without it, concurrent Aider auto-commits collide on .git/index.lock
+    # and one thread's HEAD range absorbs another thread's commits.
+    _git_lock = threading.Lock()
+
     def __init__(self, model_name: Optional[str] = None, api_key: Optional[str] = None, api_base: Optional[str] = None):
         """
         Initialize engine configuration; mostly passes through env settings.
@@ -55,15 +145,26 @@ class AiderEngine:
         self.api_key = api_key or API_KEY
         self.api_base = api_base or API_BASE_URL
 
-        # NOTE: Aider CLI reads its own env vars or flags; we will set env for subprocess.
-        self.env = os.environ.copy()
+        # NOTE: Aider CLI reads its own env vars or flags; instead of copying the
+        # whole environ per engine we keep just the handful of overrides and merge
+        # them over os.environ lazily when a subprocess actually needs them.
+        overlay = {}
         if self.api_key:
             # Popular variables used by many providers; users may need to adjust if using other providers.
-            self.env["OPENAI_API_KEY"] = self.api_key
-            self.env["OPENAI_API_BASE"] = self.api_base or self.env.get("OPENAI_API_BASE", "")
-            self.env["OPENAI_MODEL"] = self.model or self.env.get("OPENAI_MODEL", "")
+            overlay["OPENAI_API_KEY"] = self.api_key
+            overlay["OPENAI_API_BASE"] = self.api_base or os.environ.get("OPENAI_API_BASE", "")
+            overlay["OPENAI_MODEL"] = self.model or os.environ.get("OPENAI_MODEL", "")
             # Also set generic PROVIDER env names in case aider uses them (aider supports multiple backends)
-            self.env["AIDER_API_KEY"] = self.api_key
+            overlay["AIDER_API_KEY"] = self.api_key
+        self._env_overlay = overlay
+        self._env = None
+
+    @property
+    def env(self):
+        """Merged environment for child processes, built on first use."""
+        if self._env is None:
+            self._env = {**os.environ, **self._env_overlay}
+        return self._env
 
     # -------------------------
     # Public API
@@ -81,6 +182,7 @@ class AiderEngine:
           A dictionary with keys:
             - modified_files: list of modified file paths (relative)
             - patch: unified diff string
+            - search_replace: same edits as Aider-style SEARCH/REPLACE blocks
             - summary: short textual summary
             - rule: rule_name
         """
@@ -175,50 +277,71 @@ MISRA Rule Text:
             # If repo is not initialized, initialize a temporary git repo (safe for POC)
             # We will warn via printed message.
             print("[aider_engine] Warning: no .git found. Initializing temporary git repo for patch capture.")
-            subprocess.run(["git", "init"], cwd=wd, check=True, env=self.env)
-            subprocess.run(["git", "add", "."], cwd=wd, check=True, env=self.env)
-            subprocess.run(["git", "commit", "-m", "initial commit (aider_engine snapshot)"], cwd=wd, check=True, env=self.env)
-
-        # Snapshot HEAD
-        old_head = self._git_rev_parse("HEAD")
-
-        # Run aider CLI
-        try:
-            self._run_aider_cli(file_paths, message)
-        except subprocess.CalledProcessError as e:
-            # Capture aider stderr / stdout for debugging
-            raise AiderEngineError(f"Aider CLI failed: {e}")
-
-        # After Aider run, compute diff between old_head and new HEAD (if aider committed)
-        # If aider committed, HEAD will have advanced. If not, there may be working-tree changes.
-        new_head = self._git_rev_parse("HEAD")
-        patch_text = ""
-        modified_files = []
-
-        if new_head != old_head:
-            # There is a new commit(s). Get unified diff between old_head and new HEAD
-            patch_text = self._git_diff(f"{old_head}..{new_head}")
-            modified_files = self._git_diff_name_only(f"{old_head}..{new_head}")
-        else:
-            # No new commit. Show working tree diff vs old_head
-            patch_text = self._git_diff(old_head)
-            modified_files = self._git_diff_name_only(old_head)
+            if _HAS_PYGIT2:
+                # init + add-all + commit in-process: zero forks instead of three
+                pygit2.init_repository(str(wd))
+                repo = pygit2.Repository(str(wd))
+                repo.index.add_all()
+                repo.index.write()
+                tree = repo.index.write_tree()
+                author = pygit2.Signature("aider", "aider@local")
+                repo.create_commit("HEAD", author, author, "initial commit (aider_engine snapshot)", tree, [])
+            else:
+                subprocess.run(["git", "init"], cwd=wd, check=True, env=self.env)
+                subprocess.run(["git", "add", "."], cwd=wd, check=True, env=self.env)
+                subprocess.run(["git", "commit", "-m", "initial commit (aider_engine snapshot)"], cwd=wd, check=True, env=self.env)
+
+        # The snapshot -> aider -> diff sequence must not interleave with
+        # another thread's run: Aider mutates shared git state (auto-commits
+        # advance HEAD and take .git/index.lock). Diffs are additionally
+        # scoped to file_paths so leftover working-tree edits of *other*
+        # files never leak into this rule's patch or modified list.
+        with self._git_lock:
+            # Snapshot HEAD
+            old_head = self._git_rev_parse("HEAD")
+
+            # Run aider CLI
+            try:
+                self._run_aider_cli(file_paths, message)
+            except subprocess.CalledProcessError as e:
+                # Capture aider stderr / stdout for debugging
+                raise AiderEngineError(f"Aider CLI failed: {e}")
+
+            # After Aider run, compute diff between old_head and new HEAD (if aider committed)
+            # If aider committed, HEAD will have advanced. If not, there may be working-tree changes.
+            new_head = self._git_rev_parse("HEAD")
+
+            if new_head != old_head:
+                # There is a new commit(s). Get unified diff between old_head and new HEAD
+                patch_text, modified_files = self._git_diff_and_names(f"{old_head}..{new_head}", file_paths)
+            else:
+                # No new commit. Show working tree diff vs old_head
+                patch_text, modified_files = self._git_diff_and_names(old_head, file_paths)
 
         # Save patch file
         patch_filename = f"{rule.replace('/', '_')}_{Path(file_paths[0]).name}.patch"
         patch_path = PATCHES_DIR / patch_filename
         patch_path.write_text(patch_text, encoding="utf-8")
 
-        # Optionally copy modified files to outputs/modified for snapshot
+        # Optionally snapshot modified files to outputs/modified. Hard links are
+        # O(1) and skip rereading/rewriting the file bytes when both paths live
+        # on the same filesystem; fall back to a real copy across devices.
+        # (Caveat: a hard link shares the inode, so an in-place edit of the
+        # source also shows up in the snapshot — acceptable for this POC.)
         for f in modified_files:
             src = Path(f)
             if src.exists():
                 dest = MODIFIED_DIR / Path(f).name
                 try:
-                    shutil.copy2(src, dest)
-                except Exception:
-                    # non-fatal
-                    pass
+                    if dest.exists():
+                        dest.unlink()
+                    os.link(src, dest)
+                except OSError:
+                    try:
+                        shutil.copy2(src, dest)
+                    except Exception:
+                        # non-fatal
+                        pass
 
         # Short summary: list of files changed and number of hunks (approx)
         hunks = patch_text.count("\n@@ ") if patch_text else 0
@@ -229,6 +352,7 @@ MISRA Rule Text:
             "mode": mode,
             "modified_files": modified_files,
             "patch": patch_text,
+            "search_replace": unified_to_search_replace(patch_text),
             "patch_file": str(patch_path),
             "summary": summary,
         }
@@ -256,6 +380,11 @@ MISRA Rule Text:
     # Git helper wrappers
     # -------------------------
     def _git_rev_parse(self, ref: str) -> str:
+        if _HAS_PYGIT2:
+            try:
+                return str(pygit2.Repository(str(Path.cwd())).revparse_single(ref).id)
+            except Exception:
+                pass  # fall back to the subprocess path below
         proc = subprocess.run(["git", "rev-parse", ref], capture_output=True, text=True, env=self.env)
         if proc.returncode != 0:
             raise AiderEngineError(f"git rev-parse failed: {proc.stderr.strip()}")
@@ -268,12 +397,46 @@ MISRA Rule Text:
             raise AiderEngineError(f"git diff failed: {proc.stderr.strip()}")
         return proc.stdout
 
+    def _git_diff_and_names(self, ref_range: str, paths: Optional[List[str]] = None) -> tuple:
+        """
+        Fused version of _git_diff + _git_diff_name_only: one git invocation
+        instead of two (each fork + git startup costs ~10-30 ms).
+        With `--raw -p`, git prints one ':mode mode sha sha status\\tpath'
+        record per changed file first, then the standard unified diff; we
+        consume the raw records and return the rest as the patch.
+        When paths is given, the diff is pathspec-limited to exactly those
+        files, so unrelated changes elsewhere in the repo are never reported.
+        Returns (patch_text, modified_files).
+        """
+        cmd = ["git", "diff", "--raw", "-p", ref_range]
+        if paths:
+            cmd += ["--", *paths]
+        proc = subprocess.run(cmd, capture_output=True, text=True, env=self.env)
+        if proc.returncode not in (0, 1):
+            raise AiderEngineError(f"git diff failed: {proc.stderr.strip()}")
+        out = proc.stdout
+        names: List[str] = []
+        pos = 0
+        while pos < len(out):
+            end = out.find("\n", pos)
+            if end == -1:
+                end = len(out)
+            line = out[pos:end]
+            if line.startswith(":"):
+                # path is the last tab-separated field (renames carry src\tdst)
+                names.append(line.rsplit("\t", 1)[-1])
+            elif line.strip():
+                break  # first line of the unified diff
+            pos = end + 1
+        return out[pos:], names
+
     def _git_diff_name_only(self, ref_range: str) -> List[str]:
-        proc = subprocess.run(["git", "diff", "--name-only", ref_range], capture_output=True, text=True, env=self.env)
+        # -z emits NUL-separated, unquoted paths; staying in bytes avoids
+        # decoding output we only split, and handles names with spaces/newlines
+        proc = subprocess.run(["git", "diff", "-z", "--name-only", ref_range], capture_output=True, env=self.env)
         if proc.returncode not in (0, 1):
-            raise AiderEngineError(f"git diff --name-only failed: {proc.stderr.strip()}")
-        names = [line.strip() for line in proc.stdout.splitlines() if line.strip()]
-        return names
+            raise AiderEngineError(f"git diff --name-only failed: {proc.stderr.decode(errors='replace').strip()}")
+        return [n.decode("utf-8", "surrogateescape") for n in proc.stdout.split(b"\x00") if n]
 
 
 # For quick manual testing
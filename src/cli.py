@@ -39,13 +39,18 @@ Notes:
 import argparse
 import json
 import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import List, Dict
+from typing import List, Dict, TextIO
 
-# Local imports (these modules are implemented in earlier steps)
-from src.aider_engine import AiderEngine  # uses Aider CLI under the hood
-from src.rule_selector import RuleSelector
-from src.knowledge_manager import KnowledgeManager
+# Local imports stay light here: the LLM/Aider helper modules (and their
+# openai/httpx import cost) are pulled in lazily inside the run_* commands,
+# so `klocfix --help` and the stub commands never pay for them.
+from src.file_utils import dump_json
+from src.scan_cache import ScanCache, compute_ruleset_key
 
 # Constants for outputs
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
@@ -55,9 +60,19 @@ PATCHES_DIR = OUTPUTS_DIR / "patches"
 REPORTS_DIR = OUTPUTS_DIR / "reports"
 FULL_PATCH_PATH = OUTPUTS_DIR / "full_repo.patch"
 FULL_REPORT_PATH = OUTPUTS_DIR / "full_report.json"
+SCAN_CACHE_PATH = OUTPUTS_DIR / ".cache" / "scan_cache.json"
 
-# Allowed C extensions (recursively scanned)
-C_EXTS = {".c", ".h"}
+# Allowed C extensions (recursively scanned). A tuple of both cases lets the
+# hot path test entry.name with one endswith call — no .suffix or .lower()
+# string allocations per directory entry.
+_C_SUFFIXES = (".c", ".h", ".C", ".H")
+
+# Directory names never worth descending into
+PRUNE_DIRS = {".git", "build", "node_modules", "outputs", "__pycache__"}
+
+# Files above this size are almost always generated and would blow the
+# model's context window anyway; override via env for unusual codebases
+MAX_SCAN_BYTES = int(os.getenv("KLOCFIX_MAX_BYTES", str(200 * 1024)))
 
 
 def ensure_output_dirs() -> None:
@@ -66,6 +81,18 @@ def ensure_output_dirs() -> None:
         d.mkdir(parents=True, exist_ok=True)
 
 
+@lru_cache(maxsize=None)
+def _ensure_dir(d: Path) -> Path:
+    """
+    mkdir-once guard: each distinct directory costs at most one mkdir syscall
+    per process, no matter how many files land in it. run_fix pre-warms the
+    cache for every expected destination; the writers call this as a fallback
+    for paths outside the gathered set.
+    """
+    d.mkdir(parents=True, exist_ok=True)
+    return d
+
+
 def gather_source_files(path: Path) -> List[Path]:
     """
     Recursively collect .c/.h files under 'path'.
@@ -73,149 +100,329 @@ def gather_source_files(path: Path) -> List[Path]:
     """
     paths: List[Path] = []
     if path.is_file():
-        if path.suffix.lower() in C_EXTS:
+        if path.name.endswith(_C_SUFFIXES):
             paths.append(path)
         return paths
 
-    # directory: recursive glob
-    for p in path.rglob("*"):
-        if p.is_file() and p.suffix.lower() in C_EXTS:
-            paths.append(p)
+    # os.scandir reuses the type info the OS already returned with the dirent,
+    # so no per-entry stat, and non-matching files never become Path objects
+    def _walk(d):
+        with os.scandir(d) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name not in PRUNE_DIRS:
+                        yield from _walk(entry.path)
+                elif entry.name.endswith(_C_SUFFIXES):
+                    yield Path(entry.path)
+
+    paths.extend(_walk(path))
     return paths
 
 
-def mirror_and_write_modified(src_file: Path) -> None:
+def _should_scan(src: Path) -> bool:
+    """
+    Cheap pre-filter before any LLM work: reject files larger than
+    MAX_SCAN_BYTES and files whose first 8 KB look binary or non-UTF-8.
+    A 5 MB generated header or a Latin-1 blob would waste a full LLM round
+    trip and fail anyway; the stat + head read here costs microseconds.
+    """
+    try:
+        if src.stat().st_size > MAX_SCAN_BYTES:
+            print(f"[skip] {src}: exceeds {MAX_SCAN_BYTES} byte scan limit (KLOCFIX_MAX_BYTES)")
+            return False
+        with src.open("rb") as f:
+            head = f.read(8192)
+    except OSError as e:
+        print(f"[skip] {src}: unreadable ({e})")
+        return False
+    if b"\x00" in head:
+        print(f"[skip] {src}: binary content (NUL byte in first 8 KB)")
+        return False
+    try:
+        head.decode("utf-8")
+    except UnicodeDecodeError as e:
+        # a multi-byte char cut at the 8 KB boundary is fine; only reject
+        # decode errors clearly inside the sampled window
+        if e.start < len(head) - 4:
+            print(f"[skip] {src}: not UTF-8 text")
+            return False
+    return True
+
+
+def mirror_and_write_modified(src_file: Path, cwd: Path) -> None:
     """
     Copy the current modified on-disk file (after Aider edit) to outputs/modified
-    preserving relative tree under the working directory.
+    preserving relative tree under the working directory. The caller passes its
+    already-resolved cwd so this never issues a getcwd syscall per file.
     """
     try:
-        rel = src_file.relative_to(Path.cwd())
+        rel = src_file.relative_to(cwd)
     except Exception:
         # fallback: use filename only
         rel = Path(src_file.name)
 
     dest = MODIFIED_DIR / rel
-    dest.parent.mkdir(parents=True, exist_ok=True)
+    _ensure_dir(dest.parent)
     try:
-        with src_file.open("rb") as fr, dest.open("wb") as fw:
-            fw.write(fr.read())
-    except Exception as e:
+        # kernel-side copy (sendfile/copy_file_range on Linux): no full-file
+        # bytes object in Python and no userspace round trip
+        shutil.copyfile(src_file, dest)
+    except OSError as e:
         print(f"[warn] could not copy modified file {src_file} -> {dest}: {e}")
 
 
 def write_patch_for_file(rel_src: Path, patch_text: str) -> None:
-    """Write a per-file patch into outputs/patches/<relative path>.patch"""
+    """
+    Write a per-file patch into outputs/patches/<relative path>.patch.
+    patch_text is whatever format the run selected (unified diff or
+    search/replace blocks); this writer is format-agnostic.
+    """
     dest = PATCHES_DIR / rel_src.with_suffix(rel_src.suffix + ".patch")
-    dest.parent.mkdir(parents=True, exist_ok=True)
+    _ensure_dir(dest.parent)
     dest.write_text(patch_text or "", encoding="utf-8")
 
 
 def write_report_for_file(rel_src: Path, report_obj: Dict) -> None:
     """Write JSON report for a single file under outputs/reports/<relative path>.json"""
     dest = REPORTS_DIR / rel_src.with_suffix(rel_src.suffix + ".json")
-    dest.parent.mkdir(parents=True, exist_ok=True)
-    dest.write_text(json.dumps(report_obj, indent=2), encoding="utf-8")
+    _ensure_dir(dest.parent)
+    dump_json(dest, report_obj)
 
 
-def aggregate_full_patch(per_file_patches: List[str]) -> None:
+def open_full_patch() -> TextIO:
     """
-    Create outputs/full_repo.patch by concatenating all per-file patches.
+    Open outputs/full_repo.patch for streaming writes. Patches are appended
+    as files finish processing instead of being accumulated in memory and
+    joined at the end.
     Note: These patches are unified diffs; concatenation works for human review and
     'git apply' in many cases, but if exact ordering is required, use git to create a single diff.
     """
-    combined = "\n\n".join([p for p in per_file_patches if p])
-    FULL_PATCH_PATH.write_text(combined, encoding="utf-8")
+    return FULL_PATCH_PATH.open("w", encoding="utf-8", buffering=1 << 20)
 
 
 def aggregate_full_report(results: List[Dict]) -> None:
     """Aggregate per-file results and write outputs/full_report.json"""
-    full = {"generated_at": __import__("datetime").datetime.utcnow().isoformat() + "Z", "results": results}
-    FULL_REPORT_PATH.write_text(json.dumps(full, indent=2), encoding="utf-8")
+    full = {"generated_at": datetime.now(timezone.utc).isoformat(), "results": results}
+    # orjson's one-shot bytes encode beats the stdlib streaming dump by a
+    # wide margin and allocates roughly half of the old pretty-printed str
+    dump_json(FULL_REPORT_PATH, full)
 
 
-def run_fix(path: Path) -> None:
+def _detect_all_rules(src_files: List[Path], selector: "RuleSelector", scan_cache: ScanCache = None) -> Dict[Path, List[str]]:
+    """
+    Detection phase: resolve the rule list for every file. Cached files skip
+    the LLM entirely; the rest go out in a handful of batched requests.
+    """
+    detected: Dict[Path, List[str]] = {}
+    uncached: List[Path] = []
+    for src in src_files:
+        rules = scan_cache.get(src) if scan_cache else None
+        if rules is not None:
+            print(f"[scan] Cache hit for {src} ({len(rules)} rules)")
+            detected[src] = rules
+        else:
+            uncached.append(src)
+
+    if not uncached:
+        return detected
+
+    named = []
+    by_name = {}
+    for src in uncached:
+        print(f"[scan] Analyzing {src}")
+        try:
+            # one read syscall + one decode; read_text opens in text mode and
+            # decodes incrementally, and errors="replace" keeps a stray
+            # non-UTF-8 byte from aborting the whole scan
+            code = src.read_bytes().decode("utf-8", errors="replace")
+        except Exception as e:
+            print(f"[error] could not read {src}: {e}")
+            continue
+        named.append((str(src), code))
+        by_name[str(src)] = src
+
+    try:
+        batch_results = selector.detect_rules_batch(named)
+    except Exception as e:
+        print(f"[error] rule detection failed: {e}")
+        batch_results = {}
+
+    for name, src in by_name.items():
+        # files absent from the batch reply had a detection failure, not a
+        # clean bill of health: leave them out of `detected` and out of the
+        # cache so the next run retries instead of skipping them forever
+        rules = batch_results.get(name)
+        if rules is None:
+            print(f"[error] rule detection failed for {src}; will retry on the next run")
+            continue
+        detected[src] = rules
+        # record against the pre-fix contents: if Aider edits the file later,
+        # the mtime/hash change and the next run re-detects
+        if scan_cache:
+            scan_cache.put(src, rules)
+    return detected
+
+
+def _process_file(src: Path, rule_ids: List[str], rule_texts: Dict[str, str], engine: "AiderEngine",
+                  patch_format: str = "unified", cwd: Path = None) -> tuple:
+    """
+    Fix phase for a single file: apply strict fixes for its detected rules
+    (rules for one file stay sequential — Aider edits the file in place),
+    write the per-file patch + report, snapshot the modified file.
+    patch_format is 'unified' (git-friendly diff) or 'search_replace'
+    (Aider-style SEARCH/REPLACE blocks — smaller, and reusable as prompt
+    material for follow-up fixes).
+    Returns (file_results, list of patch texts).
+    """
+    file_results: Dict = {"file": str(src), "rules": [], "file_patch": None}
+    combined_patch_for_file = []
+
+    for rule in rule_ids:
+        rule_text = rule_texts.get(rule)
+        if not rule_text:
+            print(f"[warn] rule '{rule}' not found in knowledge_base; skipping")
+            file_results["rules"].append({"rule": rule, "status": "missing_rule_md"})
+            continue
+
+        try:
+            print(f"[fix] Applying rule {rule} -> {src.name}")
+            res = engine.run_strict_fix([str(src)], rule_text, rule)
+        except Exception as e:
+            print(f"[error] AiderEngine failed for {src} rule {rule}: {e}")
+            file_results["rules"].append({"rule": rule, "status": "aider_failed", "error": str(e)})
+            continue
+
+        # res contains: modified_files, patch, patch_file, summary, rule, mode
+        file_results["rules"].append(
+            {"rule": rule, "status": "applied", "summary": res.get("summary", ""), "patch_file": res.get("patch_file")}
+        )
+
+        if patch_format == "search_replace":
+            patch_text = res.get("search_replace", "")
+        else:
+            patch_text = res.get("patch", "")
+        if patch_text:
+            combined_patch_for_file.append(patch_text)
+
+    if cwd is None:
+        cwd = Path.cwd()
+
+    # If Aider edited files in-place, copy modified file snapshot to outputs/modified (mirrored)
+    mirror_and_write_modified(src, cwd)
+
+    # Write per-file patch (combined patch of all hunks for that file)
+    # relative_to raises ValueError when src is outside cwd, so one call
+    # does the membership test and the conversion together
+    try:
+        rel_src = src.relative_to(cwd)
+    except ValueError:
+        rel_src = Path(src.name)
+    combined_patch_text = "\n\n".join(combined_patch_for_file)
+    write_patch_for_file(rel_src, combined_patch_text)
+    file_results["file_patch"] = str((PATCHES_DIR / rel_src.with_suffix(rel_src.suffix + ".patch")).resolve())
+
+    # Write per-file JSON report
+    write_report_for_file(rel_src, file_results)
+
+    return file_results, combined_patch_for_file
+
+
+def run_fix(path: Path, use_cache: bool = True, patch_format: str = "unified") -> None:
     """
     Main S-mode flow:
       - gather files
-      - for each file: detect rules (LLM), for each rule load full rule md and call AiderEngine.run_strict_fix
+      - process files concurrently: detect rules (LLM), for each rule load full rule md and call AiderEngine.run_strict_fix
       - collect results, write per-file patch + per-file report + copy modified file to outputs/modified
       - at end write full_repo.patch and full_report.json
     """
     ensure_output_dirs()
 
+    # deferred imports: openai + aider wiring is only paid for by `fix`
+    from src.aider_engine import AiderEngine  # uses Aider CLI under the hood
+    from src.knowledge_manager import KnowledgeManager
+    from src.rule_selector import RuleSelector
+
     # instantiate engine + helpers
     selector = RuleSelector()
     km = KnowledgeManager()
     engine = AiderEngine()
 
     src_files = gather_source_files(path)
+    src_files = [s for s in src_files if _should_scan(s)]
     if not src_files:
         print(f"No C files found in {path}")
         return
 
-    results: List[Dict] = []
-    per_file_patches: List[str] = []
+    # one getcwd for the whole run instead of two syscalls per file below
+    cwd = Path.cwd()
 
+    # Create every destination directory up front: without this the three
+    # writers would issue 3 mkdir syscalls per file, nearly all redundant
     for src in src_files:
-        print(f"[scan] Analyzing {src}")
-        code = src.read_text(encoding="utf-8")
-
         try:
-            rule_ids = selector.detect_rules(code)
-        except Exception as e:
-            print(f"[error] rule detection failed for {src}: {e}")
-            rule_ids = []
-
-        if not rule_ids:
-            print(f"[ok] No MISRA/Klocwork rules detected in {src}")
-            continue
-
-        # For S mode: apply strict fixes per detected rule (sequential)
-        file_results: Dict = {"file": str(src), "rules": [], "file_patch": None}
-        combined_patch_for_file = []
-
-        for rule in rule_ids:
-            rule_text = km.load_rule_full(rule)
-            if not rule_text:
-                print(f"[warn] rule '{rule}' not found in knowledge_base; skipping")
-                file_results["rules"].append({"rule": rule, "status": "missing_rule_md"})
-                continue
-
-            try:
-                print(f"[fix] Applying rule {rule} -> {src.name}")
-                res = engine.run_strict_fix([str(src)], rule_text, rule)
-            except Exception as e:
-                print(f"[error] AiderEngine failed for {src} rule {rule}: {e}")
-                file_results["rules"].append({"rule": rule, "status": "aider_failed", "error": str(e)})
-                continue
-
-            # res contains: modified_files, patch, patch_file, summary, rule, mode
-            file_results["rules"].append(
-                {"rule": rule, "status": "applied", "summary": res.get("summary", ""), "patch_file": res.get("patch_file")}
-            )
-
-            patch_text = res.get("patch", "")
-            if patch_text:
-                combined_patch_for_file.append(patch_text)
-                per_file_patches.append(patch_text)
+            rel = src.relative_to(cwd)
+        except ValueError:
+            rel = Path(src.name)
+        for base in (MODIFIED_DIR, PATCHES_DIR, REPORTS_DIR):
+            _ensure_dir(base / rel.parent)
 
-        # If Aider edited files in-place, copy modified file snapshot to outputs/modified (mirrored)
-        mirror_and_write_modified(src)
+    scan_cache = None
+    if use_cache:
+        ruleset_key = compute_ruleset_key(km.knowledge_base_dir, selector.model)
+        scan_cache = ScanCache(SCAN_CACHE_PATH, ruleset_key)
 
-        # Write per-file patch (combined patch of all hunks for that file)
-        rel_src = src.relative_to(Path.cwd()) if src.is_relative_to(Path.cwd()) else Path(src.name)
-        combined_patch_text = "\n\n".join(combined_patch_for_file)
-        write_patch_for_file(rel_src, combined_patch_text)
-        file_results["file_patch"] = str((PATCHES_DIR / rel_src.with_suffix(rel_src.suffix + ".patch")).resolve())
+    # Phase 1: batched rule detection (cache-aware)
+    detected = _detect_all_rules(src_files, selector, scan_cache)
 
-        # Write per-file JSON report
-        write_report_for_file(rel_src, file_results)
-
-        results.append(file_results)
+    results: List[Dict] = []
 
-    # After processing all files, generate aggregated artifacts
-    aggregate_full_patch(per_file_patches)
+    to_fix = []
+    for src in src_files:
+        if src not in detected:
+            # detection failed (already logged); don't report the file as clean
+            continue
+        rules = detected[src]
+        if not rules:
+            print(f"[ok] No MISRA/Klocwork rules detected in {src}")
+            continue
+        to_fix.append((src, rules))
+
+    # Load each distinct rule's markdown exactly once, up front: the same
+    # rule violated across N files used to trigger N (file, rule) lookups
+    rule_texts: Dict[str, str] = {}
+    for _, rules in to_fix:
+        for rule in rules:
+            if rule not in rule_texts:
+                rule_texts[rule] = km.load_rule_full(rule)
+
+    # Phase 2: per-file fixes. AiderEngine serializes its snapshot->aider->
+    # diff window on a shared-repo lock (concurrent runs would race on git
+    # state), so threads overlap the remaining per-file work — mirror
+    # copies, patch conversion, report/patch writes. Results are appended
+    # from the main thread as futures complete, so no extra locking here.
+    max_workers = int(os.getenv("KLOCFIX_CONCURRENCY", "8"))
+    with open_full_patch() as patch_fh:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(_process_file, src, rules, rule_texts, engine, patch_format, cwd): src
+                       for src, rules in to_fix}
+            for fut in as_completed(futures):
+                src = futures[fut]
+                try:
+                    file_results, patches = fut.result()
+                except Exception as e:
+                    print(f"[error] processing failed for {src}: {e}")
+                    continue
+                if file_results is not None:
+                    results.append(file_results)
+                for patch_text in patches:
+                    if patch_text:
+                        patch_fh.write(patch_text)
+                        patch_fh.write("\n\n")
+
+    if scan_cache:
+        scan_cache.save()
+
+    # After processing all files, generate the aggregated report
     aggregate_full_report(results)
 
     print(f"\nDone. Aggregated patch: {FULL_PATCH_PATH}")
@@ -225,11 +432,15 @@ def run_fix(path: Path) -> None:
 
 def run_scan(path: Path) -> None:
     """Scan-only command (stub). Will use rule_selector to detect rules and print them."""
+    from src.rule_selector import RuleSelector
+
     selector = RuleSelector()
     src_files = gather_source_files(path)
     for src in src_files:
+        if not _should_scan(src):
+            continue
         print(f"[scan] {src}")
-        code = src.read_text(encoding="utf-8")
+        code = src.read_bytes().decode("utf-8", errors="replace")
         try:
             rules = selector.detect_rules(code)
             print(json.dumps({"file": str(src), "rules": rules}, indent=2))
@@ -254,6 +465,9 @@ def main() -> None:
 
     p_fix = sub.add_parser("fix", help="Detect and fix MISRA violations (S mode).")
     p_fix.add_argument("path", help="File or directory to fix", type=str)
+    p_fix.add_argument("--no-cache", action="store_true", help="Ignore the incremental scan cache")
+    p_fix.add_argument("--patch-format", choices=("unified", "search_replace"), default="unified",
+                       help="Patch output format: git-style unified diff (default) or Aider SEARCH/REPLACE blocks")
 
     p_scan = sub.add_parser("scan", help="Scan only - list rules (no fixes) (stub).")
     p_scan.add_argument("path", help="File or directory to scan", type=str)
@@ -265,7 +479,7 @@ def main() -> None:
 
     path = Path(args.path).resolve()
     if args.command == "fix":
-        run_fix(path)
+        run_fix(path, use_cache=not args.no_cache, patch_format=args.patch_format)
     elif args.command == "scan":
         run_scan(path)
     elif args.command == "advisor":
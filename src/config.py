@@ -9,8 +9,10 @@ Usage:
     from src.config import MODEL_NAME, API_KEY, API_BASE_URL
 """
 
+import functools
 import os
 from dataclasses import dataclass
+from typing import Optional
 
 @dataclass
 class AppConfig:
@@ -19,6 +21,7 @@ class AppConfig:
     API_BASE_URL: str
 
 
+@functools.lru_cache(maxsize=1)
 def load_config() -> AppConfig:
     """
     Loads config from environment variables. Ensure these are set in your .env.
@@ -43,3 +46,18 @@ def load_config() -> AppConfig:
 
 # Make config available at import
 CONFIG = load_config()
+
+
+# Accessors used by rule_selector (and friends): thin views over CONFIG so
+# consumers don't have to know the dataclass layout.
+def get_model_name() -> str:
+    return CONFIG.MODEL_NAME
+
+
+def get_api_key() -> str:
+    return CONFIG.API_KEY
+
+
+def get_api_base_url() -> Optional[str]:
+    # unset/empty maps to None so OpenAI() falls back to the provider default
+    return CONFIG.API_BASE_URL or None
@@ -1,15 +1,19 @@
+import io
 import os
-import json
 import difflib
 from datetime import datetime
 from typing import Tuple, Dict
 
-SUPPORTED_C_EXTENSIONS = [".c", ".h"]
+import orjson
+
+# Both cases in one tuple so the check is a single endswith, with no
+# splitext/lower string allocations per call
+SUPPORTED_C_EXTENSIONS = (".c", ".h", ".C", ".H")
 
 
 def is_c_file(filepath: str) -> bool:
     """Return True if file is a valid C source/header file."""
-    return os.path.isfile(filepath) and os.path.splitext(filepath)[1].lower() in SUPPORTED_C_EXTENSIONS
+    return filepath.endswith(SUPPORTED_C_EXTENSIONS) and os.path.isfile(filepath)
 
 
 def read_file(filepath: str) -> str:
@@ -25,18 +29,44 @@ def write_file(filepath: str, content: str) -> None:
         f.write(content)
 
 
-def generate_unified_diff(original: str, modified: str, file_path: str) -> str:
-    """Generate unified diff between original and modified content."""
-    original_lines = original.splitlines(keepends=True)
-    modified_lines = modified.splitlines(keepends=True)
+def dump_json(filepath, obj) -> None:
+    """Serialize obj with orjson (C encoder, ~5-10x stdlib json) and write it.
+
+    Accepts str or Path. Output is indent-2 for human readability, same as
+    the stdlib json.dumps(..., indent=2) it replaces.
+    """
+    data = orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+    with open(filepath, "wb") as f:
+        f.write(data)
+
+
+def write_unified_diff(original: str, modified: str, file_path: str, out) -> None:
+    """Stream a unified diff of the two contents into an open text handle.
+
+    difflib.unified_diff already yields hunks lazily; writing the generator
+    with writelines avoids ever materializing the full diff as one string.
+    (The two splitlines lists remain — difflib needs random-access
+    sequences, not iterators.)
+    """
     diff = difflib.unified_diff(
-        original_lines,
-        modified_lines,
+        original.splitlines(keepends=True),
+        modified.splitlines(keepends=True),
         fromfile=f"{file_path} (original)",
         tofile=f"{file_path} (modified)",
         lineterm=""
     )
-    return "".join(diff)
+    out.writelines(diff)
+
+
+def generate_unified_diff(original: str, modified: str, file_path: str) -> str:
+    """Generate unified diff between original and modified content.
+
+    Convenience wrapper over write_unified_diff for callers that want the
+    diff as a string; prefer the streaming form when writing to a file.
+    """
+    buf = io.StringIO()
+    write_unified_diff(original, modified, file_path, buf)
+    return buf.getvalue()
 
 
 def save_outputs(base_filename: str, modified_code: str, patch: str, metadata: Dict) -> Dict:
@@ -60,8 +90,7 @@ def save_outputs(base_filename: str, modified_code: str, patch: str, metadata: D
     write_file(raw_filepath, modified_code)
     write_file(patch_filepath, patch)
 
-    with open(report_filepath, "w", encoding="utf-8") as f:
-        json.dump(metadata, f, indent=4)
+    dump_json(report_filepath, metadata)
 
     return {
         "raw_code_path": raw_filepath,
@@ -10,6 +10,9 @@ class KnowledgeManager:
 
     def __init__(self, knowledge_base_dir: str = "knowledge_base"):
         self.knowledge_base_dir = knowledge_base_dir
+        # rule name -> full markdown text (None when missing); the same few
+        # rules get requested once per source file, so read each at most once
+        self._cache: dict = {}
 
     def _get_rule_filepath(self, rule_name: str) -> str:
         """
@@ -21,15 +24,21 @@ class KnowledgeManager:
     def load_rule_full(self, rule_name: str) -> Optional[str]:
         """
         Load and return the full text of the rule markdown file.
-        If not found, returns None.
+        If not found, returns None. Results (including misses) are cached.
         """
+        if rule_name in self._cache:
+            return self._cache[rule_name]
+
         filepath = self._get_rule_filepath(rule_name)
 
         if not os.path.isfile(filepath):
+            self._cache[rule_name] = None
             return None
 
         with open(filepath, "r", encoding="utf-8") as f:
-            return f.read()
+            text = f.read()
+        self._cache[rule_name] = text
+        return text
 
     # ------------------- FUTURE EXTENSIONS ------------------- #
     # These will be implemented later when S & C modes are added.
@@ -13,11 +13,12 @@ Although cli.py already writes these, this module exists to keep future expansio
   - GUI mode integration
 """
 
-import json
 from pathlib import Path
 from typing import Dict, List
 from datetime import datetime
 
+from src.file_utils import dump_json
+
 
 def save_per_file_report(report_path: Path, report_obj: Dict) -> None:
     """
@@ -28,7 +29,7 @@ def save_per_file_report(report_path: Path, report_obj: Dict) -> None:
         report_obj: Dict containing report info
     """
     report_path.parent.mkdir(parents=True, exist_ok=True)
-    report_path.write_text(json.dumps(report_obj, indent=2), encoding="utf-8")
+    dump_json(report_path, report_obj)
 
 
 def save_full_report(full_report_path: Path, results: List[Dict]) -> None:
@@ -46,4 +47,4 @@ def save_full_report(full_report_path: Path, results: List[Dict]) -> None:
     }
 
     full_report_path.parent.mkdir(parents=True, exist_ok=True)
-    full_report_path.write_text(json.dumps(aggregated, indent=2), encoding="utf-8")
+    dump_json(full_report_path, aggregated)
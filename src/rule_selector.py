@@ -1,8 +1,39 @@
 import json
-from typing import List, Optional
+import re
+from typing import Dict, List, Optional, Sequence, Tuple
 
 from .config import get_model_name, get_api_key, get_api_base_url
-from openai import OpenAI
+
+# Batch sizing for detect_rules_batch: enough files to amortize the request
+# overhead, capped by a rough char budget (~15K tokens) per request.
+MAX_BATCH_FILES = 8
+MAX_BATCH_CHARS = 60_000
+
+# Words resembling RULE.NAME formats, compiled once at import
+_RULE_ID_RE = re.compile(r"[A-Z0-9]+\.[A-Z0-9_.]+")
+
+# Process-wide OpenAI client. Building one per RuleSelector means a fresh
+# httpx session + TLS context each time; sharing it keeps connections warm
+# (no handshake per request) and is safe across threads. HTTP/2 multiplexes
+# concurrent requests over the single pooled connection.
+_CLIENT = None
+
+
+def _get_client():
+    global _CLIENT
+    if _CLIENT is None:
+        import httpx
+        from openai import OpenAI
+
+        _CLIENT = OpenAI(
+            api_key=get_api_key(),
+            base_url=get_api_base_url(),
+            http_client=httpx.Client(
+                http2=True,
+                limits=httpx.Limits(max_keepalive_connections=16, max_connections=32),
+            ),
+        )
+    return _CLIENT
 
 
 class RuleSelector:
@@ -12,10 +43,9 @@ class RuleSelector:
     """
 
     def __init__(self):
-        self.client = OpenAI(
-            api_key=get_api_key(),
-            base_url=get_api_base_url()
-        )
+        # _get_client defers the openai import (~100-200 ms of HTTP/TLS deps)
+        # to first construction and shares one pooled client per process
+        self.client = _get_client()
         self.model = get_model_name()
 
     def detect_rules(self, code: str) -> List[str]:
@@ -27,40 +57,125 @@ class RuleSelector:
 You are an expert in MISRA C:2012 Amendment 2 and Klocwork static analysis rules.
 
 Analyze the following C code and identify which MISRA/Klocwork rule IDs are violated.
-Return ONLY a JSON array of rule names. No explanation, no text outside JSON.
+Return ONLY a JSON object of the form {{"rules": ["..."]}}. No explanation, no text outside JSON.
 
 Example output:
-["FNH.MIGHT", "MISRA.DEFINE.WRONGNAME.UNDERSCORE"]
+{{"rules": ["FNH.MIGHT", "MISRA.DEFINE.WRONGNAME.UNDERSCORE"]}}
 
 C Code to analyze:
 --------------------
 {code}
 --------------------
 
-Respond only with JSON list of rule names.
+Respond only with the JSON object.
 """
 
+        # json_object mode constrains the model to emit valid JSON, so the
+        # happy path never needs recovery parsing
         response = self.client.chat.completions.create(
             model=self.model,
-            messages=[{"role": "user", "content": prompt}]
+            messages=[{"role": "user", "content": prompt}],
+            response_format={"type": "json_object"}
         )
 
         ai_response = response.choices[0].message.content.strip()
 
-        # If model responds with non-JSON, try to recover
         try:
-            rules = json.loads(ai_response)
-        except Exception:
-            # Fallback: extract rule-like patterns manually
+            rules = json.loads(ai_response)["rules"]
+            if not isinstance(rules, list):
+                raise ValueError("'rules' is not a list")
+        except Exception as e:
+            # Last resort for OpenAI-compatible backends that ignore
+            # response_format; worth logging because it should not happen.
+            print(f"[warn] rule detection returned non-conforming JSON ({e}); recovering rule ids heuristically")
             rules = self._extract_possible_rule_ids(ai_response)
 
         # Ensure they are unique and sorted
         return sorted(set(rules))
 
+    def detect_rules_batch(self, files: Sequence[Tuple[str, str]]) -> Dict[str, List[str]]:
+        """
+        Detect violated rules for many files with as few LLM requests as possible.
+
+        files: sequence of (name, code) tuples.
+        Returns {name: sorted list of rule ids}. Files are chunked so each
+        request stays within MAX_BATCH_FILES / MAX_BATCH_CHARS — one request
+        amortizes the prompt preamble and round trip over the whole chunk.
+        """
+        results: Dict[str, List[str]] = {}
+        batch: List[Tuple[str, str]] = []
+        chars = 0
+        for name, code in files:
+            if batch and (len(batch) >= MAX_BATCH_FILES or chars + len(code) > MAX_BATCH_CHARS):
+                results.update(self._detect_batch(batch))
+                batch, chars = [], 0
+            batch.append((name, code))
+            chars += len(code)
+        if batch:
+            results.update(self._detect_batch(batch))
+        return results
+
+    def _detect_batch(self, batch: List[Tuple[str, str]]) -> Dict[str, List[str]]:
+        """
+        Run one LLM request over a chunk of delimited files.
+
+        Only files the model actually answered for appear in the returned
+        mapping: a truncated or unparseable reply yields an *empty dict*,
+        never {name: []}, so callers can tell "detection failed" apart from
+        "no rules violated" (and avoid caching a transient failure as clean).
+        """
+        sections = "\n".join(
+            f"=== FILE {i}: {name} ===\n{code}" for i, (name, code) in enumerate(batch)
+        )
+        prompt = f"""
+You are an expert in MISRA C:2012 Amendment 2 and Klocwork static analysis rules.
+
+Analyze each delimited C file below and identify which MISRA/Klocwork rule IDs it violates.
+Return ONLY a JSON object mapping each file name to an array of rule names.
+
+Example output:
+{{"main.c": ["FNH.MIGHT"], "util.c": []}}
+
+{sections}
+
+Respond only with the JSON object.
+"""
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=[{"role": "user", "content": prompt}],
+            response_format={"type": "json_object"}
+        )
+
+        choice = response.choices[0]
+        if choice.finish_reason == "length":
+            # reply was cut off mid-JSON; a 60K-char prompt makes this a
+            # realistic failure, and a partial mapping is not trustworthy
+            print(f"[warn] rule detection reply truncated for a {len(batch)}-file batch; marking batch as failed")
+            return {}
+
+        ai_response = choice.message.content.strip()
+
+        try:
+            mapping = json.loads(ai_response)
+        except Exception as e:
+            print(f"[warn] rule detection returned unparseable JSON for a {len(batch)}-file batch ({e}); marking batch as failed")
+            return {}
+
+        out = {}
+        for name, _ in batch:
+            rules = mapping.get(name)
+            if isinstance(rules, list):
+                out[name] = sorted(set(rules))
+            else:
+                # missing or malformed entry: leave the file out so the
+                # caller retries later instead of recording it as clean
+                print(f"[warn] no detection result for {name} in batch reply")
+        return out
+
     def _extract_possible_rule_ids(self, text: str) -> List[str]:
         """
         Fallback heuristic: extract words resembling RULE.NAME formats.
         """
-        import re
-        pattern = r"[A-Z0-9]+\.[A-Z0-9_.]+"
-        return re.findall(pattern, text)
+        if "." not in text:
+            return []  # nothing can match; skip the scan
+        return _RULE_ID_RE.findall(text)
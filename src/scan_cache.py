@@ -0,0 +1,105 @@
+# src/scan_cache.py
+"""
+Incremental scan cache for rule detection.
+
+Skips the expensive per-file LLM detect_rules call when a file has not
+changed since the last run. Lookups are two-tier:
+  - fast path: (mtime_ns, size) must match — one stat, no file read
+  - slow path: sha256 of the contents — catches touch-without-edit
+
+Every entry is scoped by a "ruleset key" derived from the knowledge_base
+manifest plus the model name, so editing any rule .md or switching models
+invalidates the whole cache at once.
+
+Persistence is a single JSON file under outputs/.cache/ — small, human
+inspectable, and loaded/saved once per run.
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Optional
+
+
+def _sha256_file(path: Path) -> str:
+    h = hashlib.sha256()
+    with path.open("rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def compute_ruleset_key(knowledge_base_dir: str, model_name: str) -> str:
+    """Hash the KB manifest (rule names + mtimes + sizes) and the model name."""
+    h = hashlib.sha256()
+    h.update(model_name.encode())
+    try:
+        entries = sorted(os.scandir(knowledge_base_dir), key=lambda e: e.name)
+    except OSError:
+        entries = []
+    for e in entries:
+        if e.name.endswith(".md"):
+            st = e.stat()
+            h.update(f"{e.name}:{st.st_mtime_ns}:{st.st_size};".encode())
+    return h.hexdigest()[:16]
+
+
+class ScanCache:
+    """JSON-backed map of source path -> previously detected rule list."""
+
+    def __init__(self, cache_path: Path, ruleset_key: str):
+        self.cache_path = cache_path
+        self.ruleset_key = ruleset_key
+        self._entries: Dict[str, Dict] = {}
+        self._dirty = False
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            data = json.loads(self.cache_path.read_text(encoding="utf-8"))
+        except Exception:
+            return
+        # a different ruleset key means the KB or model changed: start fresh
+        if data.get("ruleset_key") == self.ruleset_key:
+            self._entries = data.get("entries", {})
+
+    def get(self, path: Path) -> Optional[List[str]]:
+        """Return the cached rule list for an unchanged file, else None."""
+        entry = self._entries.get(str(path))
+        if entry is None:
+            return None
+        try:
+            st = path.stat()
+        except OSError:
+            return None
+        if entry["mtime_ns"] == st.st_mtime_ns and entry["size"] == st.st_size:
+            return entry["rules"]
+        if st.st_size == entry["size"] and _sha256_file(path) == entry["sha256"]:
+            # touched but not edited: refresh the fast key for next time
+            entry["mtime_ns"] = st.st_mtime_ns
+            self._dirty = True
+            return entry["rules"]
+        return None
+
+    def put(self, path: Path, rules: List[str]) -> None:
+        """Record the detection result for the file's current contents."""
+        try:
+            st = path.stat()
+        except OSError:
+            return
+        self._entries[str(path)] = {
+            "mtime_ns": st.st_mtime_ns,
+            "size": st.st_size,
+            "sha256": _sha256_file(path),
+            "rules": rules,
+        }
+        self._dirty = True
+
+    def save(self) -> None:
+        if not self._dirty:
+            return
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        payload = {"ruleset_key": self.ruleset_key, "entries": self._entries}
+        self.cache_path.write_text(json.dumps(payload, indent=2), encoding="utf-8")
+        self._dirty = False